@@ -3,10 +3,121 @@
 import json
 import logging
 import time
-from typing import Union
+from types import TracebackType
+from typing import Optional, Self, Union
 
+import orjson
 import requests
-from tenacity import retry, stop_after_attempt, wait_exponential
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import ConnectionPool
+from urllib3.exceptions import ReadTimeoutError
+from urllib3.response import BaseHTTPResponse
+from urllib3.util.retry import Retry
+
+from debt_checker.cache import DebtCache
+from debt_checker.rate_limiter import RateLimiter
+
+_BASE_URL = "https://api-cloud.ru/api/fssp.php"
+
+# Retried by urllib3 inside the connection pool; other errors are returned at once
+MAX_RETRIES = 3
+BACKOFF_FACTOR = 1
+MAX_BACKOFF = 10
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+# Connection pool size; should cover the number of concurrent worker threads
+POOL_SIZE = 32
+
+# Shared session so worker threads reuse keep-alive TCP/TLS connections
+_SESSION = requests.Session()
+
+# Optional persistent cache consulted before every API call
+_CACHE: Optional[DebtCache] = None
+
+# Optional limit on outgoing requests per second, shared by all threads
+_RATE_LIMITER: Optional[RateLimiter] = None
+
+
+class _RateLimitedRetry(Retry):
+    """Retry that counts every repeated attempt against the rate limit."""
+
+    def increment(
+        self,
+        method: Optional[str] = None,
+        url: Optional[str] = None,
+        response: Optional[BaseHTTPResponse] = None,
+        error: Optional[Exception] = None,
+        _pool: Optional[ConnectionPool] = None,
+        _stacktrace: Optional[TracebackType] = None,
+    ) -> Self:
+        """Record a failed attempt and wait for a token before the next one."""
+        retry = super().increment(method, url, response, error, _pool, _stacktrace)
+        _wait_for_rate_limit()
+        return retry
+
+    def _is_read_error(self, err: Exception) -> bool:
+        """Treat only read timeouts as read errors.
+
+        urllib3 also counts ``ProtocolError`` (e.g. a connection reset by a
+        stale keep-alive socket) here, which ``read=0`` would stop retrying.
+        """
+        return isinstance(err, ReadTimeoutError)
+
+
+def configure_session(pool_size: int = POOL_SIZE) -> None:
+    """Mount a connection pool large enough for ``pool_size`` concurrent requests.
+
+    Connection errors, 429 and 5xx responses are retried by the adapter with
+    exponential backoff, honouring ``Retry-After`` when present. Dropped
+    connections are retried too. Read timeouts are not: the request may
+    already have been billed, and each one can take up to the full timeout.
+
+    Args:
+        pool_size: Maximum number of simultaneous requests (worker threads)
+
+    """
+    retry = _RateLimitedRetry(
+        total=MAX_RETRIES,
+        read=0,
+        backoff_factor=BACKOFF_FACTOR,
+        backoff_max=MAX_BACKOFF,
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=frozenset({"GET"}),
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    _SESSION.mount(
+        "https://",
+        HTTPAdapter(
+            pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry
+        ),
+    )
+
+
+configure_session()
+
+
+def enable_cache(path: str) -> DebtCache:
+    """Turn on the persistent debt cache stored at ``path``.
+
+    Returns:
+        DebtCache: The active cache instance
+
+    """
+    global _CACHE
+    _CACHE = DebtCache(path)
+    return _CACHE
+
+
+def set_rate_limit(rate: Optional[float]) -> None:
+    """Limit API calls to ``rate`` requests per second (None disables it)."""
+    global _RATE_LIMITER
+    _RATE_LIMITER = RateLimiter(rate) if rate else None
+
+
+def get_cached_debt(number: str) -> Optional[tuple[float, float]]:
+    """Return ``(amount, fetched_at)`` from the cache, None if not cached."""
+    return None if _CACHE is None else _CACHE.lookup(number)
 
 
 def _handle_api_response(data: dict,
@@ -28,25 +139,25 @@ def _handle_api_response(data: dict,
     """
     if "error" in data:
         if data["error"] == "602":
-            logger.error(f'API access denied for {number}: {data["message"]}')
+            logger.error("API access denied for %s: %s", number, data["message"])
             return "TOKEN_NO_ACCESS"
         if data["error"] == "498":
-            logger.error(f'Insufficient balance for {number}: {data["message"]}')
+            logger.error("Insufficient balance for %s: %s", number, data["message"])
             return "TOKEN_NO_MONEY"
         return None
 
     if data.get("status") != 200:
-        logger.warning(f'Non-200 status for {number}: {data.get("status")}')
+        logger.warning("Non-200 status for %s: %s", number, data.get("status"))
         return None
 
     if data.get("count") == 1:
         try:
             return float(data["records"][0]["sum"])
         except (KeyError, ValueError, IndexError) as e:
-            logger.error(f"Data parsing failed for {number}: {e!s}")
+            logger.error("Data parsing failed for %s: %s", number, e)
             return None
     elif data.get("count") == 0:
-        logger.info(f"No debt found for {number}")
+        logger.debug("No debt found for %s", number)
         return 0.0
     return None
 
@@ -54,13 +165,19 @@ def _handle_api_response(data: dict,
 def _log_api_error(error: Exception, number: str, logger: logging.Logger) -> None:
     """Log API processing errors with appropriate level."""
     if isinstance(error, json.JSONDecodeError):
-        logger.error(f"Invalid JSON for {number}: {error}")
+        logger.error("Invalid JSON for %s: %s", number, error)
     elif isinstance(error, requests.exceptions.RequestException):
-        logger.error(f"Request failed for {number}: {error}")
+        logger.error("Request failed for %s: %s", number, error)
     elif isinstance(error, KeyError):
-        logger.error(f"Missing expected keys in response for {number}: {error}")
+        logger.error("Missing expected keys in response for %s: %s", number, error)
     else:
-        logger.exception(f"Unexpected error processing {number}")
+        logger.exception("Unexpected error processing %s", number)
+
+
+def _wait_for_rate_limit() -> None:
+    """Block until the configured rate limit allows another request."""
+    if _RATE_LIMITER is not None:
+        _RATE_LIMITER.acquire()
 
 
 def get_debt_amount(number: str,
@@ -81,15 +198,26 @@ def get_debt_amount(number: str,
         None: Processing error occurred
 
     """
-    api_url = f"https://api-cloud.ru/api/fssp.php?type=ip&number={number}&token={api_token}"
+    cached = get_cached_debt(number)
+    if cached is not None:
+        logger.debug("Cache hit for %s: %s", number, cached[0])
+        return cached[0]
+
+    params = {"type": "ip", "number": number, "token": api_token}
 
     try:
         start_time = time.time()
-        response = requests.get(api_url, timeout=timeout)
+        _wait_for_rate_limit()
+        response = _SESSION.get(_BASE_URL, params=params, timeout=timeout)
         response.raise_for_status()
 
-        logger.info(f"API request for {number} took {time.time() - start_time:.2f}s")
-        return _handle_api_response(response.json(), number, logger)
+        logger.debug(
+            "API request for %s took %.2fs", number, time.time() - start_time
+        )
+        result = _handle_api_response(orjson.loads(response.content), number, logger)
+        if _CACHE is not None and isinstance(result, float):
+            _CACHE.set(number, result)
+        return result
 
     except Exception as e:
         _log_api_error(e, number, logger)
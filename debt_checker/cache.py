@@ -0,0 +1,121 @@
+"""Persistent cache of debt lookups shared between runs."""
+
+import os
+import sqlite3
+import threading
+import time
+from collections.abc import Iterable
+from typing import Optional
+
+DEFAULT_TTL = 7 * 86400  # Cached debts are trusted for a week
+NEGATIVE_TTL = 86400  # "No debt" answers go stale sooner; new debts may appear
+
+
+class DebtCache:
+    """SQLite-backed mapping of enforcement number to debt amount.
+
+    A single connection is shared by all worker threads and guarded by a lock,
+    so lookups are safe to call from ThreadPoolExecutor workers.
+    """
+
+    def __init__(
+        self, path: str, ttl: float = DEFAULT_TTL, negative_ttl: float = NEGATIVE_TTL
+    ) -> None:
+        """Open (or create) the cache database at ``path``.
+
+        Args:
+            path: SQLite file location, parent directory is created if missing
+            ttl: Seconds a stored debt stays valid
+            negative_ttl: Seconds a stored zero (no debt) stays valid
+
+        """
+        cache_dir = os.path.dirname(path)
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        # WAL with NORMAL sync commits each insert without a full fsync,
+        # so caching a result never stalls the worker holding the lock
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS debts ("
+                "number TEXT PRIMARY KEY, amount REAL NOT NULL, expires REAL NOT NULL)"
+            )
+
+    def get(self, number: str) -> Optional[float]:
+        """Return the cached debt for ``number`` or None on miss/expiry."""
+        entry = self.lookup(number)
+        return None if entry is None else entry[0]
+
+    def lookup(self, number: str) -> Optional[tuple[float, float]]:
+        """Return ``(amount, fetched_at)`` for ``number`` or None on miss/expiry.
+
+        The lookup time is derived from the stored expiry, so it is the time
+        of the original API call, not of this cache hit.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT amount, expires FROM debts WHERE number = ? AND expires > ?",
+                (number, time.time()),
+            ).fetchone()
+        if row is None:
+            return None
+        amount, expires = row
+        return amount, expires - (self.ttl if amount else self.negative_ttl)
+
+    def set(self, number: str, amount: float) -> None:
+        """Store the debt amount for ``number``."""
+        self.set_many([(number, amount)])
+
+    def set_many(self, items: Iterable[tuple[str, float]]) -> None:
+        """Store several ``(number, amount)`` pairs in one transaction."""
+        now = time.time()
+        rows = (
+            (number, float(amount), self._expires(amount, now))
+            for number, amount in items
+        )
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO debts (number, amount, expires) "
+                "VALUES (?, ?, ?)",
+                rows,
+            )
+
+    def backfill(self, items: Iterable[tuple[str, float, float]]) -> int:
+        """Add ``(number, amount, fetched_at)`` lookups made by earlier runs.
+
+        Expiry counts from ``fetched_at``, so stale lookups are dropped, and
+        numbers the cache already holds are left alone so old data can never
+        push their expiry forward.
+
+        Returns:
+            int: Number of entries added
+
+        """
+        now = time.time()
+        rows = [
+            (number, float(amount), expires)
+            for number, amount, fetched_at in items
+            if (expires := self._expires(amount, fetched_at)) > now
+        ]
+        with self._lock, self._conn:
+            cursor = self._conn.executemany(
+                "INSERT OR IGNORE INTO debts (number, amount, expires) "
+                "VALUES (?, ?, ?)",
+                rows,
+            )
+        return cursor.rowcount
+
+    def _expires(self, amount: float, fetched_at: float) -> float:
+        """Return when a lookup of ``amount`` made at ``fetched_at`` goes stale."""
+        return fetched_at + (self.ttl if amount else self.negative_ttl)
+
+    def close(self) -> None:
+        """Close the underlying database connection."""
+        with self._lock:
+            self._conn.close()
@@ -1,7 +1,13 @@
 """Logging configuration setup for the debt checker application."""
 
+import atexit
 import logging
+import logging.handlers
 import os
+import queue
+
+# Records buffered in memory before they are written to the log file
+LOG_BUFFER_CAPACITY = 1024
 
 
 def setup_logging(log_file="logs/app.log", log_level=logging.INFO):
@@ -17,6 +23,9 @@ def setup_logging(log_file="logs/app.log", log_level=logging.INFO):
     Side Effects:
         - Creates log directory if it doesn't exist
         - Sets up basicConfig for entire application
+        - Starts a background listener thread that owns the log file
+        - Buffers records in memory; WARNING and above flush the buffer at once
+        - Echoes WARNING and above to stderr
 
     Example:
         >>> logger = setup_logging()
@@ -27,11 +36,38 @@ def setup_logging(log_file="logs/app.log", log_level=logging.INFO):
     if not os.path.exists(log_dir):
         os.makedirs(log_dir)
 
-    logging.basicConfig(
-        filename=log_file,
-        level=log_level,
-        format="%(asctime)s - %(name)s - %(module)s - %(message)s",
-        datefmt="%d-%m-%Y %H:%M:%S",
+    file_handler = logging.FileHandler(log_file)
+    file_handler.setFormatter(
+        logging.Formatter(
+            "%(asctime)s - %(name)s - %(module)s - %(message)s",
+            datefmt="%d-%m-%Y %H:%M:%S",
+        )
+    )
+    buffered_handler = logging.handlers.MemoryHandler(
+        capacity=LOG_BUFFER_CAPACITY,
+        flushLevel=logging.WARNING,
+        target=file_handler,
     )
+
+    # Only problems reach the console so the progress bar stays readable
+    console_handler = logging.StreamHandler()
+    console_handler.setLevel(logging.WARNING)
+    console_handler.setFormatter(logging.Formatter("%(levelname)s: %(message)s"))
+
+    # Worker threads only enqueue records; the listener thread does all I/O
+    log_queue = queue.Queue(-1)
+    listener = logging.handlers.QueueListener(
+        log_queue, buffered_handler, console_handler, respect_handler_level=True
+    )
+    listener.start()
+    atexit.register(listener.stop)
+
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    # QueueHandler.prepare() interpolates msg % args on the logging thread;
+    # "%(message)s" keeps that from adding a second layout, which the listener's
+    # handlers apply when they write the record
+    queue_handler.setFormatter(logging.Formatter("%(message)s"))
+
+    logging.basicConfig(level=log_level, handlers=[queue_handler])
     logger = logging.getLogger(__name__)
     return logger
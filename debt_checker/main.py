@@ -1,18 +1,24 @@
 """Main execution module for debt checker application."""
 
+import math
 import os
 import sys
 
 from dotenv import load_dotenv
 
+from debt_checker.api_client import enable_cache, set_rate_limit
 from debt_checker.logging_config import setup_logging
 from debt_checker.utils import (
+    API_RATE_LIMIT,
+    CACHE_FILE,
     FINAL_FILE,
     MAX_THREADS,
     SAVE_INTERVAL,
     TEMP_FILES_DIR,
+    ProgressState,
     load_input_data,
     merge_temp_files,
+    prime_cache_from_temp_files,
     process_rows_concurrently,
     save_temp_data,
     setup_signal_handler,
@@ -31,6 +37,8 @@ def main():
 
     Environment Variables:
         API_TOKEN: Required authentication token
+        MAX_THREADS: Optional number of concurrent API requests (default: 20)
+        API_RATE_LIMIT: Optional max API requests per second (default: no limit)
 
     Exit Codes:
         0: Success
@@ -47,38 +55,57 @@ def main():
         )
         sys.exit(1)
 
+    try:
+        max_threads = int(os.getenv("MAX_THREADS", MAX_THREADS))
+        if max_threads <= 0:
+            raise ValueError(max_threads)
+    except ValueError:
+        logger.error("MAX_THREADS must be a positive integer.")
+        sys.exit(1)
+
+    rate_limit = os.getenv("API_RATE_LIMIT")
+    try:
+        api_rate_limit = float(rate_limit) if rate_limit else API_RATE_LIMIT
+        # isfinite rejects NaN and inf, which the token bucket cannot use
+        if api_rate_limit is not None and not (
+            math.isfinite(api_rate_limit) and api_rate_limit >= 0
+        ):
+            raise ValueError(rate_limit)
+    except ValueError:
+        logger.error("API_RATE_LIMIT must be a finite non-negative number.")
+        sys.exit(1)
+
     # Make sure the temporary files directory exists
     os.makedirs(TEMP_FILES_DIR, exist_ok=True)
 
-    # Initialize variables before signal handler
-    temp_data = []
-    processed_data = []
-    counter = 0
+    set_rate_limit(api_rate_limit)
+
+    # Reuse debts from previous runs instead of querying the API again
+    cache = enable_cache(CACHE_FILE)
+    prime_cache_from_temp_files(cache, TEMP_FILES_DIR, logger)
+
+    # Kept here so the finally block can save results the loop did not flush
+    state = ProgressState()
 
-    setup_signal_handler(
-        temp_data=temp_data,
-        processed_data=processed_data,
-        counter=counter,
-        logger=logger,
-        temp_files_dir=TEMP_FILES_DIR,
-    )
+    setup_signal_handler()
 
     df = None
     # Data pipeline
     try:
         df = load_input_data("numbers.xlsx", logger)
-        processed_data, counter = process_rows_concurrently(
+        process_rows_concurrently(
             df=df,
             api_token=api_token,
-            max_threads=MAX_THREADS,
+            max_threads=max_threads,
             save_interval=SAVE_INTERVAL,
             temp_dir=TEMP_FILES_DIR,
             logger=logger,
+            state=state,
         )
 
     finally:
         logger.info("Saving before exiting...")
-        save_temp_data(processed_data, counter, logger, TEMP_FILES_DIR)
+        save_temp_data(state.processed, state.counter, logger, TEMP_FILES_DIR)
 
         # Merge temp files
         merge_temp_files(
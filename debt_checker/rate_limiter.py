@@ -0,0 +1,49 @@
+"""Request rate limiting shared by all worker threads."""
+
+import threading
+import time
+from typing import Optional
+
+
+class RateLimiter:
+    """Token bucket that spaces out calls to at most ``rate`` per second.
+
+    Callers reserve a token under the lock and sleep outside of it, so
+    waiting threads queue up in order without blocking each other.
+    """
+
+    def __init__(self, rate: float, burst: Optional[int] = None) -> None:
+        """Create a limiter.
+
+        Args:
+            rate: Allowed calls per second
+            burst: Calls allowed back-to-back after an idle period
+                (default: one second worth of calls)
+
+        """
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = rate
+        self.capacity = burst or max(1, int(rate))
+        self._tokens = float(self.capacity)
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """Block until a call is allowed.
+
+        Returns:
+            float: Seconds spent waiting
+
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(
+                self.capacity, self._tokens + (now - self._last) * self.rate
+            )
+            self._last = now
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+        if wait > 0:
+            time.sleep(wait)
+        return wait
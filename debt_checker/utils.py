@@ -1,12 +1,17 @@
 """Core utilities for debt processing and data handling."""
 
 import concurrent.futures
+import csv
+import glob
+import itertools
 import logging
 import os
+import queue
 import signal
 import sys
 import threading
-from dataclasses import dataclass
+import time
+from dataclasses import astuple, dataclass, field, fields
 from datetime import datetime
 from typing import List, Optional, Union
 
@@ -14,41 +19,66 @@ import pandas as pd
 import requests
 from tqdm.auto import tqdm
 
-from debt_checker.api_client import get_debt_amount
+from debt_checker.api_client import (
+    configure_session,
+    get_cached_debt,
+    get_debt_amount,
+)
+from debt_checker.cache import DebtCache
 
 # Constants
 TEMP_FILES_DIR = "temp_files"  # Define the temporary files directory
+TEMP_FILE_PREFIX = "numbers_with_debt_temp"
+TEMP_FILE = f"{TEMP_FILE_PREFIX}.csv"  # Append-only checkpoint inside TEMP_FILES_DIR
+RETIRED_FILE = f"{TEMP_FILE_PREFIX}-old.csv"  # Checkpoint from an older format
+CACHE_FILE = os.path.join("cache", "fssp.db")  # Persistent debt lookup cache
 FINAL_FILE = f"numbers_with_debt_{datetime.now().strftime('%H%M%S')}.xlsx"  # Name for the final file
 SAVE_INTERVAL = 10
+FLUSH_SECONDS = 30  # Save pending results at least this often on slow runs
 API_TIMEOUT = 400
-API_DELAY = 0.5
+API_RATE_LIMIT = None  # Max API requests per second, None for no limit
 MAX_THREADS = 20
+WINDOW_PER_THREAD = 3  # Pending futures kept per worker thread
+WRITE_QUEUE_SIZE = 4  # Batches waiting for the writer before the result loop blocks
+
+# Debt values returned by the API client when the token cannot be used
+TOKEN_ERRORS = ("TOKEN_NO_ACCESS", "TOKEN_NO_MONEY")
 
 # Thread safe stop flag
 stop_event = threading.Event()
 
+# Serializes checkpoint appends from the writer thread and the main thread
+_save_lock = threading.Lock()
+
+
+@dataclass
+class ProgressState:
+    """Progress shared between the processing loop and its caller.
+
+    The caller keeps the same instance, so after an interruption or error it
+    still sees the live counter and the results that have not been saved yet.
+    """
+
+    counter: int = 0
+    processed: list = field(default_factory=list)
+
 
 # Signal handler
-def setup_signal_handler(
-    temp_data: List,
-    processed_data: List,
-    counter: int,
-    logger: logging.Logger,
-    temp_files_dir: str,
-) -> None:
+def setup_signal_handler() -> None:
     """Configure the signal handler for graceful shutdown.
 
-    Must be called after variables are initialized but before processing starts.
+    The handler only sets ``stop_event``. It runs on the main thread and may
+    interrupt it mid-write or mid-queue operation, even inside the logging
+    queue's lock, so the processing loop logs the stop and the caller saves
+    the pending results.
     """
 
     def signal_handler(sig, frame):
         stop_event.set()
-        logger.info("Received termination signal. Saving data...")
-        save_temp_data(temp_data + processed_data, counter, logger, temp_files_dir)
-        logger.info("Exiting...")
 
     signal.signal(signal.SIGINT, signal_handler)
 
+
 def load_input_data(file_path: str, logger: logging.Logger) -> pd.DataFrame:
     """Load and validate input Excel file with numbers.
 
@@ -59,24 +89,35 @@ def load_input_data(file_path: str, logger: logging.Logger) -> pd.DataFrame:
 
     """
     try:
-        df = pd.read_excel(file_path)
-        logger.info(f"File loaded successfully. Found {len(df)} numbers")
+        # calamine parses xlsx in Rust, much faster than openpyxl's XML walk.
+        # Numbers are read as text once so they never turn into "123.0"
+        df = pd.read_excel(file_path, engine="calamine", dtype={"number": str})
+        logger.info("File loaded successfully. Found %d numbers", len(df))
 
-        # Ensure required column exists
+        # Ensure required column exists; nullable Float64 keeps debts unboxed
         if "Debt Amount" not in df.columns:
-            df["Debt Amount"] = pd.NA
+            df["Debt Amount"] = pd.Series(pd.NA, index=df.index, dtype="Float64")
             logger.info('Created "Debt Amount" column for missing values')
+        else:
+            df["Debt Amount"] = _as_nullable_float(df["Debt Amount"])
 
         return df
 
     except FileNotFoundError:
-        logger.error(f"Input file not found: {file_path}")
+        logger.error("Input file not found: %s", file_path)
         sys.exit(1)
     except Exception as e:
-        logger.exception(f"Error loading input file: {e}")
+        logger.exception("Error loading input file: %s", e)
         sys.exit(1)
 
 
+def _as_nullable_float(values: pd.Series) -> pd.Series:
+    """Return numeric ``values`` as nullable Float64, other dtypes unchanged."""
+    if pd.api.types.is_numeric_dtype(values):
+        return values.astype("Float64")
+    return values
+
+
 @dataclass
 class ProcessResult:
     """Stores debt check results for a single enforcement number."""
@@ -85,71 +126,120 @@ class ProcessResult:
     number: str
     debt_amount: Optional[float]
     error: Optional[str] = None
+    fetched_at: float = field(default_factory=time.time, compare=False)
 
 
 def process_row(
-    index: int, row: pd.Series, api_token: str, logger
+    index: int, num: str, api_token: str, logger
 ) -> Union[ProcessResult, None]:
     """Process single row of enforcement numbers data and check for debts.
 
     Args:
         index: Row index from source DataFrame
-        row: Pandas Series containing enforcement numbers data
+        num: Enforcement number
         api_token: API authentication token
         logger: Configured logger instance
 
     Returns:
-        Union[ProcessResult, str, None]:
-            - ProcessResult: Contains debt data if processed
-            - 'API_ERROR': For token/auth failures
-            - None: If skipped (existing data) or interrupted
+        Union[ProcessResult, None]:
+            - ProcessResult: Contains debt data if processed; for token/auth
+              failures debt_amount holds one of TOKEN_ERRORS
+            - None: If interrupted
 
     Note:
         Uses global stop_event for graceful interruption handling
 
     """
     if stop_event.is_set():
-        logger.info(f"process for index {index} interrupted.")
-        return None
-
-    num = str(row.iloc[0])
-    existing_debt = row.get("Debt Amount", pd.NA)
-
-    if not pd.isna(existing_debt):
-        logger.info(
-            f"Debt amount already exists for"
-            f"number {num} at index {index}. Skipping API call"
-        )
+        logger.debug("process for index %s interrupted.", index)
         return None
 
     try:
+        # Keep the original lookup time so a cache hit never extends its expiry
+        cached = get_cached_debt(num)
+        if cached is not None:
+            amount, fetched_at = cached
+            logger.debug("Cache hit for %s: %s", num, amount)
+            return ProcessResult(index, num, amount, fetched_at=fetched_at)
+
         debt_amount = get_debt_amount(num, api_token, logger, API_TIMEOUT)
 
-        if debt_amount in ("TOKEN_NO_ACCESS", "TOKEN_NO_MONEY"):
-            logger.error(f"Stopping processing due to API error: {debt_amount}")
+        if debt_amount in TOKEN_ERRORS:
+            logger.error("Stopping processing due to API error: %s", debt_amount)
             stop_event.set()
             return ProcessResult(index, num, debt_amount, None)
-            # return 'API_ERROR'
 
-        logger.info(
-            f"Found and updated debt amount "
-            f"for number {num} at index {index}: {debt_amount}"
+        logger.debug(
+            "Found and updated debt amount for number %s at index %s: %s",
+            num,
+            index,
+            debt_amount,
         )
         return ProcessResult(index, num, debt_amount)
     except requests.exceptions.RequestException as e:
         logger.error(
-            f"Network error during API call for number {num} at index {index}: {e}"
+            "Network error during API call for number %s at index %s: %s",
+            num,
+            index,
+            e,
         )
         return ProcessResult(index, num, None, "NETWORK_ERROR")
     except Exception as e:
         logger.error(
-            f"Network error during API call for number {num} at index {index}: {e}"
+            "Unexpected error during API call for number %s at index %s: %s",
+            num,
+            index,
+            e,
         )
         return ProcessResult(index, num, None, "UNKNOWN_ERROR")
 
 
+def drop_duplicate_numbers(df: pd.DataFrame, logger) -> pd.DataFrame:
+    """Keep a single row per enforcement number that still needs an API call.
+
+    Rows that already have a debt amount are kept as is. Results are later
+    mapped back to every row by number in merge_temp_files, so duplicates
+    don't need their own API call.
+    """
+    missing = (
+        df["Debt Amount"].isna()
+        if "Debt Amount" in df.columns
+        else pd.Series(True, index=df.index)
+    )
+    numbers = df.iloc[:, 0].astype(str)
+    duplicated = numbers[missing].duplicated()
+    if duplicated.any():
+        logger.info("Skipping %d duplicate numbers", duplicated.sum())
+        return df.drop(index=duplicated[duplicated].index)
+    return df
+
+
+def iter_completed(executor, fn, args_iter, window):
+    """Run ``fn(*args)`` for every item of ``args_iter`` with bounded look-ahead.
+
+    At most ``window`` futures are pending at any time, so memory stays
+    proportional to the window instead of the number of tasks.
+
+    Yields:
+        concurrent.futures.Future: Futures in completion order
+
+    """
+    args_iter = iter(args_iter)
+    pending = {
+        executor.submit(fn, *args) for args in itertools.islice(args_iter, window)
+    }
+    while pending:
+        done, pending = concurrent.futures.wait(
+            pending, return_when=concurrent.futures.FIRST_COMPLETED
+        )
+        # Refill before handing results back so workers stay busy
+        for args in itertools.islice(args_iter, len(done)):
+            pending.add(executor.submit(fn, *args))
+        yield from done
+
+
 def process_rows_concurrently(
-    df, api_token, max_threads, save_interval, temp_dir, logger
+    df, api_token, max_threads, save_interval, temp_dir, logger, state=None
 ):
     """Process DataFrame rows concurrently with ThreadPoolExecutor.
 
@@ -157,128 +247,317 @@ def process_rows_concurrently(
         df: Input DataFrame containing enforcement numbers
         api_token: API authentication token
         max_threads: Maximum worker threads to use
-        save_interval: Save progress every N records
+        save_interval: Save progress every N records, or after FLUSH_SECONDS
         temp_dir: Directory for temporary data saves
         logger: Configured logger instance
+        state: ProgressState shared with the signal handler (new one if None)
 
     Returns:
         tuple: (processed_data, counter)
-            processed_data: List of ProcessResult objects
+            processed_data: List of ProcessResult objects not saved yet
             counter: Total records processed
 
     Note:
         Implements periodic saving and graceful interruption handling
 
     """
-    processed_data = []
-    counter = 0
+    if state is None:
+        state = ProgressState()
+
+    # Rows that already have a debt never reach the executor
+    if "Debt Amount" in df.columns:
+        missing = df["Debt Amount"].isna()
+        if not missing.all():
+            logger.info("Skipping %d numbers with existing debt", (~missing).sum())
+            df = df[missing]
+    df = drop_duplicate_numbers(df, logger)
+
+    # More threads than pending rows would only sit idle
+    max_threads = max(1, min(max_threads, len(df)))
+    logger.info("Using %d worker threads", max_threads)
+
+    # Every worker thread gets its own keep-alive connection
+    configure_session(max_threads)
+
+    # Checkpoints are written by a separate thread so draining results never
+    # waits on disk; if writes fall behind, the result loop blocks on put()
+    batches = queue.Queue(maxsize=WRITE_QUEUE_SIZE)
+    writer = threading.Thread(
+        target=_write_batches, args=(batches, logger, temp_dir), daemon=True
+    )
+    writer.start()
+    last_flush = time.monotonic()
 
     try:
         with concurrent.futures.ThreadPoolExecutor(max_workers=max_threads) as executor:
-            futures = {
-                executor.submit(process_row, index, row, api_token, logger): index
-                for index, row in df.iterrows()
-            }
+            numbers = df.iloc[:, 0].astype(str).to_numpy()
+            tasks = (
+                (index, num, api_token, logger)
+                for index, num in zip(df.index, numbers, strict=True)
+            )
+            completed = iter_completed(
+                executor, process_row, tasks, max_threads * WINDOW_PER_THREAD
+            )
             for future in tqdm(
-                concurrent.futures.as_completed(futures),
+                completed,
                 total=len(df),
                 desc="Processing...",
                 unit="number",
+                # Redraw at most twice a second; terminal writes hold a lock
+                mininterval=0.5,
+                miniters=max(1, len(df) // 1000),
+                smoothing=0,
             ):
                 if stop_event.is_set():
+                    logger.info("Stop requested. Finishing in-flight requests...")
                     logger.info("Exiting from the process loop...")
+                    # Drop queued rows now instead of letting workers pick them up
+                    executor.shutdown(wait=False, cancel_futures=True)
                     break
 
-                # index = futures[future]
                 result = future.result()
 
-                if result == "API_ERROR":
+                if (
+                    isinstance(result, ProcessResult)
+                    and result.debt_amount in TOKEN_ERRORS
+                ):
+                    # No further call can succeed with this token
                     logger.error("Stopping processing due to API error")
+                    stop_event.set()
+                    executor.shutdown(wait=False, cancel_futures=True)
                     break
 
                 if result:
-                    processed_data.append(result)
-                    counter += 1
-
-                if counter % save_interval == 0:
-                    save_temp_data(processed_data.copy(), counter, logger, temp_dir)
-                    processed_data.clear()
-
-        return processed_data, counter
+                    state.processed.append(result)
+                    state.counter += 1
+
+                now = time.monotonic()
+                if state.processed and (
+                    len(state.processed) >= save_interval
+                    or now - last_flush >= FLUSH_SECONDS
+                ):
+                    # Hand the batch over and start a new list instead of copying
+                    to_save, state.processed = state.processed, []
+                    batches.put((to_save, state.counter))
+                    last_flush = now
+
+        return state.processed, state.counter
     except Exception as e:
-        logger.exception(f"Error occurred during processing: {e}")
+        logger.exception("Error occurred during processing: %s", e)
         raise
+    finally:
+        batches.put(None)
+        writer.join()
+
+
+def _write_batches(batches: queue.Queue, logger, temp_dir) -> None:
+    """Save ``(data, counter)`` batches from ``batches`` until None arrives."""
+    while (batch := batches.get()) is not None:
+        data, counter = batch
+        save_temp_data(data, counter, logger, temp_dir)
 
 
 def save_temp_data(data, counter, logger, temp_files_dir):
-    """Save data to temporary CSV file."""
+    """Append data to the checkpoint CSV file in ``temp_files_dir``.
+
+    Each batch is fsynced so a crash or power loss keeps every saved row.
+    """
     try:
-        if data:
-            filename = f"numbers_with_debt_temp_{counter}.csv"
-            full_path = os.path.join(temp_files_dir, filename)
-            temp_df = pd.DataFrame(data)
-            temp_df.to_csv(full_path, index=False)
+        if not data:
+            logger.info("No data to save")
+            return
+        with _save_lock:
+            full_path = os.path.join(temp_files_dir, TEMP_FILE)
+            header = [field.name for field in fields(ProcessResult)]
+            _drop_torn_row(full_path)
+            _retire_stale_checkpoint(full_path, header)
+            with open(full_path, "a", newline="", encoding="utf-8") as f:
+                writer = csv.writer(f)
+                # Append mode opens at the end, so position 0 means a new file
+                if f.tell() == 0:
+                    writer.writerow(header)
+                writer.writerows(astuple(result) for result in data)
+                f.flush()
+                os.fsync(f.fileno())
             logger.info(
-                f"Data saved to {full_path} after processing {counter} API calls"
+                "Data saved to %s after processing %d API calls", full_path, counter
             )
-        else:
-            logger.info("No data to save")
     except Exception as e:
-        logger.exception(f"Error saving temporary file: {e}")
+        logger.exception("Error saving temporary file: %s", e)
+
+
+def _ends_with_newline(f) -> bool:
+    """Return True if binary file ``f`` is empty or ends with a newline."""
+    if f.seek(0, os.SEEK_END) == 0:
+        return True
+    f.seek(-1, os.SEEK_END)
+    return f.read(1) == b"\n"
+
+
+def _drop_torn_row(full_path: str) -> None:
+    """Cut off a partial last row left by a crash in the middle of a save.
+
+    Otherwise the next batch would be appended onto the torn row and turn it
+    into a line pandas cannot parse.
+    """
+    try:
+        f = open(full_path, "r+b")
+    except FileNotFoundError:
+        return
+    with f:
+        if _ends_with_newline(f):
+            return
+        end = f.tell()
+        while end > 0:
+            start = max(0, end - 4096)
+            f.seek(start)
+            newline = f.read(end - start).rfind(b"\n")
+            if newline != -1:
+                f.truncate(start + newline + 1)
+                return
+            end = start
+        f.truncate(0)
+
+
+def _read_checkpoint(path: str) -> pd.DataFrame:
+    """Read a checkpoint CSV, skipping rows torn by a crash mid-write."""
+    df = pd.read_csv(path, dtype={"number": str}, on_bad_lines="skip")
+    with open(path, "rb") as f:
+        if not _ends_with_newline(f):
+            df = df.iloc[:-1]
+    return df
+
+
+def _retire_stale_checkpoint(full_path: str, header: List[str]) -> None:
+    """Move aside a checkpoint written with different columns.
+
+    The renamed file still matches list_temp_files and sorts before the
+    current checkpoint, so its rows are merged as the oldest ones.
+    """
+    try:
+        with open(full_path, newline="", encoding="utf-8") as f:
+            existing = next(csv.reader(f), header)
+    except FileNotFoundError:
+        return
+    if existing != header:
+        os.replace(full_path, os.path.join(os.path.dirname(full_path), RETIRED_FILE))
+
+
+def _temp_file_age(path: str) -> tuple:
+    """Sort key placing older checkpoint files first.
+
+    Numbered legacy files come in numeric order, then the retired
+    old-format checkpoint, then the current one.
+    """
+    name = os.path.basename(path)
+    if name == TEMP_FILE:
+        return (2, 0, name)
+    if name == RETIRED_FILE:
+        return (1, 0, name)
+    suffix = name[len(TEMP_FILE_PREFIX):-len(".csv")].lstrip("_")
+    return (0, int(suffix) if suffix.isdigit() else -1, name)
+
+
+def list_temp_files(temp_dir) -> List[str]:
+    """Return paths of checkpoint CSV files, oldest first.
+
+    Later files win when the same number appears more than once, so the
+    current checkpoint is always last.
+    """
+    pattern = os.path.join(glob.escape(str(temp_dir)), f"{TEMP_FILE_PREFIX}*.csv")
+    return sorted(glob.glob(pattern), key=_temp_file_age)
+
+
+def prime_cache_from_temp_files(cache: DebtCache, temp_dir, logger) -> int:
+    """Load debts saved by previous runs into the persistent cache.
+
+    Only numeric debt amounts are cached; token errors and failed lookups
+    are left out so they are retried. Entries expire relative to the
+    recorded lookup time, and rows without one are skipped.
+
+    Returns:
+        int: Number of cached entries
+
+    """
+    if not os.path.isdir(temp_dir):
+        return 0
+
+    # Later rows overwrite earlier ones, so the latest lookup per number wins
+    items: dict[str, tuple[float, float]] = {}
+    for f in list_temp_files(temp_dir):
+        try:
+            temp_df = _read_checkpoint(f)
+        except Exception as e:
+            logger.warning("Skipping unreadable temp file %s: %s", f, e)
+            continue
+        if "fetched_at" not in temp_df.columns:
+            continue
+        amounts = pd.to_numeric(temp_df["debt_amount"], errors="coerce")
+        fetched_at = pd.to_numeric(temp_df["fetched_at"], errors="coerce")
+        valid = amounts.notna() & fetched_at.notna()
+        items.update(
+            zip(
+                temp_df.loc[valid, "number"],
+                zip(amounts[valid], fetched_at[valid], strict=True),
+                strict=True,
+            )
+        )
+
+    added = cache.backfill(
+        (number, amount, fetched) for number, (amount, fetched) in items.items()
+    )
+    logger.info("Primed cache with %d debts from previous runs", added)
+    return added
 
 
 def merge_temp_files(temp_dir, original_df, final_path, logger):
     """Merge all temporary files into final Excel file while preserving original order and existing debts."""
     try:
-        all_temp_files = [
-            os.path.join(temp_dir, f)
-            for f in os.listdir(temp_dir)
-            if f.startswith("numbers_with_debt_temp_") and f.endswith(".csv")
-        ]
+        all_temp_files = list_temp_files(temp_dir)
 
         if not all_temp_files:
             logger.warning("No temporary CSV files found to merge")
             return None
 
-        # Read and merge all temp files
-        all_dfs = [pd.read_csv(temp) for temp in all_temp_files]
-        merged_df = pd.concat(all_dfs, ignore_index=True)
-
-        # Ensure consistent data types
-        original_df["number"] = original_df["number"].astype(str)
-        merged_df["number"] = merged_df["number"].astype(str)
-
-        # CRITICAL FIX: Proper deduplication - keep first non-NA value
-        merged_df = merged_df.sort_values('debt_amount', na_position='last')
-        merged_df = merged_df.drop_duplicates('number', keep='first')
+        # Read all temp files as strings; a single checkpoint needs no concat
+        all_dfs = [_read_checkpoint(temp) for temp in all_temp_files]
+        merged_df = (
+            all_dfs[0] if len(all_dfs) == 1 else pd.concat(all_dfs, ignore_index=True)
+        )
 
-        # Preserve original order
-        original_df = original_df.reset_index().rename(columns={"index": "original_index"})
+        # Token error markers are not debts; those rows stay empty for a re-run
+        merged_df["debt_amount"] = pd.to_numeric(
+            merged_df["debt_amount"], errors="coerce"
+        ).astype("Float64")
 
-        # Efficiently update only NA values using mapping
-        debt_mapping = merged_df.set_index('number')['debt_amount'].to_dict()
-        mask = original_df['Debt Amount'].isna()
-        original_df.loc[mask, 'Debt Amount'] = original_df.loc[mask, 'number'].map(debt_mapping)
+        # Rows are appended in lookup order, so the latest non-NA value wins
+        merged_df = merged_df.dropna(subset=["debt_amount"]).drop_duplicates(
+            "number", keep="last"
+        )
 
-        # Prepare final output
-        final_df = (
-            original_df
-            .sort_values("original_index")
-            .drop(columns=["original_index"])
-            [["number", "Debt Amount"]]
+        # Update only NA values; map() against an indexed Series is a hash lookup
+        debt_by_number = merged_df.set_index("number")["debt_amount"]
+        final_df = original_df[["number", "Debt Amount"]].reset_index(drop=True)
+        final_df["Debt Amount"] = _as_nullable_float(final_df["Debt Amount"])
+        mask = final_df["Debt Amount"].isna()
+        final_df.loc[mask, "Debt Amount"] = (
+            final_df.loc[mask, "number"].map(debt_by_number)
         )
 
         save_dataframe_to_excel(final_df, final_path, index=False, logger=logger)
-        logger.info(f"Merged data saved to {final_path}")
+        logger.info("Merged data saved to %s", final_path)
         return final_df
     except Exception as e:
-        logger.exception(f"Merging failed: {e}")
+        logger.exception("Merging failed: %s", e)
         raise
 
 
 def save_dataframe_to_excel(df, filename, index=False, logger=None):
     """Save DataFrame to Excel file with error logging.
 
+    The workbook is written next to ``filename`` first and renamed into place,
+    so a crash mid-write never leaves a truncated file behind.
+
     Args:
         df: Data to save
         filename: Output path
@@ -286,11 +565,19 @@ def save_dataframe_to_excel(df, filename, index=False, logger=None):
         logger: Optional logger instance
 
     """
+    root, ext = os.path.splitext(filename)
+    part_path = f"{root}.part{ext}"
     try:
-        df.to_excel(filename, index=index)
+        # No constant_memory: pandas writes column by column, and that mode
+        # drops every cell not in the row currently being flushed
+        with pd.ExcelWriter(part_path, engine="xlsxwriter") as writer:
+            df.to_excel(writer, index=index)
+        os.replace(part_path, filename)
         if logger:
-            logger.info(f"Data saved to {filename}")
+            logger.info("Data saved to %s", filename)
     except Exception as e:
+        if os.path.exists(part_path):
+            os.remove(part_path)
         if logger:
-            logger.exception(f"Error saving to Excel file: {e}")
+            logger.exception("Error saving to Excel file: %s", e)
         raise e
@@ -1,3 +1,4 @@
+import json
 import logging
 from unittest.mock import patch, MagicMock
 
@@ -32,7 +33,7 @@ def test_handle_api_response_no_debt(mock_logger):
     }
     result = _handle_api_response(response_data, "123", mock_logger)
     assert result == 0.0
-    mock_logger.info.assert_called_once()
+    mock_logger.debug.assert_called_once()
 
 def test_handle_api_response_token_no_access(mock_logger):
     response_data = {
@@ -56,13 +57,112 @@ def test_handle_api_response_invalid_data(mock_logger):
 
 def test_get_debt_amount_success(mock_logger, api_token):
     mock_response = MagicMock()
-    mock_response.json.return_value = {
+    mock_response.content = json.dumps({
         "status": 200,
         "count": 1,
         "records": [{"sum": "1500.50"}]
-    }
+    }).encode()
 
-    with patch('requests.get', return_value=mock_response):
+    with patch('debt_checker.api_client._SESSION.get', return_value=mock_response):
         result = get_debt_amount("123", api_token, mock_logger)
 
     assert result == 1500.50
+
+
+def test_configure_session_sizes_pool():
+    from debt_checker.api_client import _SESSION, configure_session
+
+    configure_session(50)
+    adapter = _SESSION.get_adapter("https://api-cloud.ru")
+    assert adapter._pool_maxsize == 50
+    configure_session()
+
+
+def test_get_debt_amount_uses_cache(mock_logger, api_token, tmp_path):
+    from debt_checker import api_client
+
+    cache = api_client.enable_cache(str(tmp_path / "fssp.db"))
+    cache.set("123", 42.0)
+    try:
+        with patch('debt_checker.api_client._SESSION.get') as mock_get:
+            result = get_debt_amount("123", api_token, mock_logger)
+        assert result == 42.0
+        mock_get.assert_not_called()
+    finally:
+        api_client._CACHE = None
+
+
+def test_configure_session_retries_transient_errors():
+    from debt_checker.api_client import _SESSION
+
+    retry = _SESSION.get_adapter("https://api-cloud.ru").max_retries
+    assert retry.total == 3
+    assert 429 in retry.status_forcelist
+    assert 503 in retry.status_forcelist
+    assert retry.respect_retry_after_header
+    assert retry.read == 0
+
+
+def test_retries_wait_for_rate_limit():
+    from urllib3.exceptions import ConnectTimeoutError
+
+    from debt_checker.api_client import _SESSION
+
+    retry = _SESSION.get_adapter("https://api-cloud.ru").max_retries
+    with patch('debt_checker.api_client._wait_for_rate_limit') as mock_wait:
+        retry = retry.increment(method="GET", url="/", error=ConnectTimeoutError())
+        retry.increment(method="GET", url="/", error=ConnectTimeoutError())
+
+    assert mock_wait.call_count == 2
+
+
+def test_retries_dropped_connections_but_not_read_timeouts():
+    from urllib3.exceptions import MaxRetryError, ProtocolError, ReadTimeoutError
+
+    from debt_checker.api_client import _SESSION
+
+    retry = _SESSION.get_adapter("https://api-cloud.ru").max_retries
+    with patch('debt_checker.api_client._wait_for_rate_limit'):
+        retry.increment(method="GET", url="/",
+                        error=ProtocolError("Connection aborted."))
+        with pytest.raises(MaxRetryError):
+            retry.increment(method="GET", url="/",
+                            error=ReadTimeoutError(None, "/", "Read timed out."))
+
+
+def test_get_debt_amount_client_error(mock_logger, api_token):
+    mock_response = MagicMock()
+    mock_response.status_code = 404
+    mock_response.raise_for_status.side_effect = requests.exceptions.HTTPError(
+        response=mock_response
+    )
+
+    with patch('debt_checker.api_client._SESSION.get',
+               return_value=mock_response) as mock_get:
+        result = get_debt_amount("123", api_token, mock_logger)
+
+    assert result is None
+    mock_get.assert_called_once()
+
+
+def test_get_debt_amount_encodes_query_params(mock_logger, api_token):
+    mock_response = MagicMock()
+    mock_response.content = json.dumps({"status": 200, "count": 0}).encode()
+
+    with patch('debt_checker.api_client._SESSION.get',
+               return_value=mock_response) as mock_get:
+        get_debt_amount("1234/56/7890-ИП", api_token, mock_logger)
+
+    params = mock_get.call_args.kwargs["params"]
+    assert params == {"type": "ip", "number": "1234/56/7890-ИП", "token": api_token}
+
+
+def test_get_debt_amount_invalid_json(mock_logger, api_token):
+    mock_response = MagicMock()
+    mock_response.content = b"<html>Bad gateway</html>"
+
+    with patch('debt_checker.api_client._SESSION.get', return_value=mock_response):
+        result = get_debt_amount("123", api_token, mock_logger)
+
+    assert result is None
+    mock_logger.error.assert_called_once()
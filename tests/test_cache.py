@@ -0,0 +1,53 @@
+import time
+
+import pytest
+
+from debt_checker.cache import DebtCache
+
+
+def test_cache_roundtrip(tmp_path):
+    cache = DebtCache(str(tmp_path / "cache" / "fssp.db"))
+    assert cache.get("123") is None
+
+    cache.set("123", 1500.5)
+    assert cache.get("123") == 1500.5
+
+
+def test_cache_persists_between_instances(tmp_path):
+    path = str(tmp_path / "fssp.db")
+    cache = DebtCache(path)
+    cache.set_many([("1", 0.0), ("2", 10.0)])
+    cache.close()
+
+    reopened = DebtCache(path)
+    assert reopened.get("1") == 0.0
+    assert reopened.get("2") == 10.0
+
+
+def test_cache_lookup_returns_original_fetch_time(tmp_path):
+    cache = DebtCache(str(tmp_path / "fssp.db"))
+    fetched_at = time.time() - 3600
+    cache.backfill([("1", 0.0, fetched_at), ("2", 10.0, fetched_at)])
+
+    assert cache.lookup("1") == pytest.approx((0.0, fetched_at))
+    assert cache.lookup("2") == pytest.approx((10.0, fetched_at))
+    assert cache.lookup("3") is None
+
+
+def test_cache_expired_entries_are_misses(tmp_path):
+    cache = DebtCache(str(tmp_path / "fssp.db"), ttl=-1)
+    cache.set("123", 100.0)
+    assert cache.get("123") is None
+
+
+def test_cache_zero_debts_use_negative_ttl(tmp_path):
+    cache = DebtCache(str(tmp_path / "fssp.db"), negative_ttl=-1)
+    cache.set_many([("1", 0.0), ("2", 10.0)])
+    assert cache.get("1") is None
+    assert cache.get("2") == 10.0
+
+
+def test_cache_uses_wal_journal(tmp_path):
+    cache = DebtCache(str(tmp_path / "fssp.db"))
+    mode = cache._conn.execute("PRAGMA journal_mode").fetchone()[0]
+    assert mode == "wal"
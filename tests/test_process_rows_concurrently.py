@@ -1,7 +1,7 @@
 import pytest
 import pandas as pd
 from unittest.mock import MagicMock, patch
-from debt_checker.utils import process_rows_concurrently
+from debt_checker.utils import ProcessResult, process_rows_concurrently
 
 @pytest.fixture
 def mock_logger():
@@ -22,17 +22,19 @@ def test_process_rows_concurrently(mock_dataframe, mock_logger):
          patch('debt_checker.utils.save_temp_data') as mock_save_temp_data, \
          patch('debt_checker.utils.stop_event') as mock_stop_event:
 
-        mock_process_row.side_effect = lambda index, row, api_token, logger: f"Processed {index}"
+        mock_process_row.side_effect = lambda index, num, api_token, logger: f"Processed {index}"
         mock_stop_event.is_set.return_value = False
 
         processed_data, counter = process_rows_concurrently(
             mock_dataframe, api_token, max_threads, save_interval, temp_dir, mock_logger
         )
 
-        assert len(processed_data) == 3
+        # Every result was handed off to save_temp_data, nothing is left over
+        assert processed_data == []
         assert counter == 3
+        saved = [r for call in mock_save_temp_data.call_args_list for r in call.args[0]]
+        assert sorted(saved) == ["Processed 0", "Processed 1", "Processed 2"]
         mock_process_row.assert_called()
-        mock_save_temp_data.assert_called()
 
 def test_process_rows_concurrently_api_error(mock_dataframe, mock_logger):
     api_token = "fake_api_token"
@@ -44,7 +46,10 @@ def test_process_rows_concurrently_api_error(mock_dataframe, mock_logger):
          patch('debt_checker.utils.save_temp_data') as mock_save_temp_data, \
          patch('debt_checker.utils.stop_event') as mock_stop_event:
 
-        mock_process_row.side_effect = ["API_ERROR", "Processed 1", "Processed 2"]
+        # Every row fails the same way, so whichever finishes first stops the run
+        mock_process_row.side_effect = lambda index, num, api_token, logger: (
+            ProcessResult(index, num, "TOKEN_NO_ACCESS")
+        )
         mock_stop_event.is_set.return_value = False
 
         processed_data, counter = process_rows_concurrently(
@@ -54,6 +59,7 @@ def test_process_rows_concurrently_api_error(mock_dataframe, mock_logger):
         assert len(processed_data) == 0
         assert counter == 0
         mock_process_row.assert_called()
+        mock_stop_event.set.assert_called()
         mock_save_temp_data.assert_not_called()
         mock_logger.error.assert_called_with("Stopping processing due to API error")
 
@@ -67,17 +73,18 @@ def test_process_rows_concurrently_stop_event(mock_dataframe, mock_logger):
          patch('debt_checker.utils.save_temp_data') as mock_save_temp_data, \
          patch('debt_checker.utils.stop_event') as mock_stop_event:
 
-        mock_process_row.side_effect = lambda index, row, api_token, logger: f"Processed {index}"
+        mock_process_row.side_effect = lambda index, num, api_token, logger: f"Processed {index}"
         mock_stop_event.is_set.side_effect = [False, True, False]
 
         processed_data, counter = process_rows_concurrently(
             mock_dataframe, api_token, max_threads, save_interval, temp_dir, mock_logger
         )
 
-        assert len(processed_data) == 1
+        # The first result is saved (save_interval=1), then the loop stops
+        assert processed_data == []
         assert counter == 1
         mock_process_row.assert_called()
-        mock_save_temp_data.assert_not_called()
+        mock_save_temp_data.assert_called_once()
         mock_logger.info.assert_called_with("Exiting from the process loop...")
 
 def test_process_rows_concurrently_exception(mock_dataframe, mock_logger):
@@ -98,4 +105,66 @@ def test_process_rows_concurrently_exception(mock_dataframe, mock_logger):
                 mock_dataframe, api_token, max_threads, save_interval, temp_dir, mock_logger
             )
 
-        mock_logger.exception.assert_called_with("Error occurred during processing: Test exception")
\ No newline at end of file
+        mock_logger.exception.assert_called_with(
+            "Error occurred during processing: %s", mock_process_row.side_effect
+        )
+
+def test_process_rows_concurrently_skips_existing_debts(mock_logger):
+    df = pd.DataFrame({
+        'number': ['1', '2', '3', '2'],
+        'Debt Amount': [10.0, None, 0.0, None]
+    })
+
+    with patch('debt_checker.utils.process_row') as mock_process_row, \
+         patch('debt_checker.utils.save_temp_data'):
+        mock_process_row.return_value = None
+        process_rows_concurrently(df, "fake_api_token", 2, 10, "/tmp", mock_logger)
+
+    submitted = [call.args[1] for call in mock_process_row.call_args_list]
+    assert submitted == ['2']
+
+
+def test_iter_completed_bounds_pending_futures():
+    import concurrent.futures
+
+    from debt_checker.utils import iter_completed
+
+    submitted = []
+
+    def args_iter():
+        for i in range(50):
+            submitted.append(i)
+            yield (i,)
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=2) as executor:
+        completed = iter_completed(executor, lambda i: i, args_iter(), window=4)
+        first = next(completed)
+        # Only the window (plus one refill round) is submitted before results flow
+        assert len(submitted) <= 8
+        results = [first.result()] + [f.result() for f in completed]
+
+    assert sorted(results) == list(range(50))
+
+
+def test_process_rows_concurrently_caps_threads_to_rows(mock_dataframe, mock_logger):
+    with patch('debt_checker.utils.process_row', return_value=None), \
+         patch('debt_checker.utils.configure_session') as mock_configure:
+        process_rows_concurrently(mock_dataframe, "fake_api_token", 50, 10, "/tmp", mock_logger)
+
+    mock_configure.assert_called_once_with(3)
+    mock_logger.info.assert_any_call("Using %d worker threads", 3)
+
+
+def test_process_rows_concurrently_flushes_on_time(mock_dataframe, mock_logger):
+    with patch('debt_checker.utils.process_row') as mock_process_row, \
+         patch('debt_checker.utils.save_temp_data') as mock_save_temp_data, \
+         patch('debt_checker.utils.FLUSH_SECONDS', 0):
+        mock_process_row.side_effect = lambda index, num, api_token, logger: f"Processed {index}"
+
+        processed_data, counter = process_rows_concurrently(
+            mock_dataframe, "fake_api_token", 2, 100, "/tmp", mock_logger
+        )
+
+    # Far below save_interval, but every result is older than FLUSH_SECONDS
+    assert processed_data == []
+    assert mock_save_temp_data.call_count == 3
@@ -0,0 +1,46 @@
+from unittest.mock import patch
+
+import pytest
+
+from debt_checker.rate_limiter import RateLimiter
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock():
+    fake = FakeClock()
+    with patch('debt_checker.rate_limiter.time', fake):
+        yield fake
+
+
+def test_rate_limiter_allows_burst_then_spaces_calls(clock):
+    limiter = RateLimiter(rate=2, burst=2)
+
+    waits = [limiter.acquire() for _ in range(4)]
+
+    assert waits[:2] == [0.0, 0.0]
+    assert waits[2:] == [0.5, 0.5]
+    assert clock.now == pytest.approx(1.0)
+
+
+def test_rate_limiter_refills_while_idle(clock):
+    limiter = RateLimiter(rate=1)
+    limiter.acquire()
+
+    clock.now += 5
+    assert limiter.acquire() == 0.0
+
+
+def test_rate_limiter_rejects_non_positive_rate():
+    with pytest.raises(ValueError):
+        RateLimiter(rate=0)
@@ -2,16 +2,22 @@
 import pytest
 import pandas as pd
 import os
+import time
 from unittest.mock import MagicMock, patch
-from utils import (
+from debt_checker.utils import (
     load_input_data,
     process_row,
     process_rows_concurrently,
     save_temp_data,
     merge_temp_files,
     save_dataframe_to_excel,
-    ProcessResult, setup_signal_handler
+    ProcessResult, setup_signal_handler,
+    prime_cache_from_temp_files,
+    drop_duplicate_numbers,
+    list_temp_files,
+    stop_event
 )
+from debt_checker.cache import DEFAULT_TTL, DebtCache
 
 @pytest.fixture
 def mock_logger():
@@ -42,6 +48,14 @@ def test_load_input_data_success(tmp_path, mock_logger):
     mock_logger.info.assert_called()
 
 
+def test_load_input_data_reads_numbers_as_text(tmp_path, mock_logger):
+    test_file = tmp_path / "test.xlsx"
+    pd.DataFrame({'number': [123, 456]}).to_excel(test_file, index=False)
+
+    result = load_input_data(str(test_file), mock_logger)
+    assert list(result['number']) == ['123', '456']
+
+
 def test_load_input_data_missing_file(mock_logger):
     with pytest.raises(SystemExit):
         load_input_data("nonexistent.xlsx", mock_logger)
@@ -55,24 +69,30 @@ def test_load_input_data_adds_debt_column(tmp_path, mock_logger):
 
     result = load_input_data(str(test_file), mock_logger)
     assert 'Debt Amount' in result.columns
+    assert result['Debt Amount'].dtype == 'Float64'
 
 
-def test_process_row_existing_data(sample_dataframe, mock_logger):
-    row = sample_dataframe.iloc[1]  # Has existing debt
-    result = process_row(0, row, "test_token", mock_logger)
-    assert result is None
-    mock_logger.info.assert_called()
-
 def test_process_row_api_success(mock_logger):
-    test_row = pd.Series(['123'], index=['number'])
-    with patch('utils.get_debt_amount', return_value=500.0):
-        result = process_row(0, test_row, "test_token", mock_logger)
+    with patch('debt_checker.utils.get_debt_amount', return_value=500.0):
+        result = process_row(0, '123', "test_token", mock_logger)
         assert result.debt_amount == 500.0
 
+
+def test_process_row_cache_hit_keeps_fetch_time(mock_logger):
+    fetched_at = time.time() - 3600
+    with patch('debt_checker.utils.get_cached_debt',
+               return_value=(100.0, fetched_at)), \
+         patch('debt_checker.utils.get_debt_amount') as mock_get:
+        result = process_row(0, '123', "test_token", mock_logger)
+
+    mock_get.assert_not_called()
+    assert result.debt_amount == 100.0
+    assert result.fetched_at == fetched_at
+
+
 def test_process_row_api_error(mock_logger):
-    test_row = pd.Series(['123'], index=['number'])
-    with patch('utils.get_debt_amount', return_value="TOKEN_NO_ACCESS"):
-        result = process_row(0, test_row, "test_token", mock_logger)
+    with patch('debt_checker.utils.get_debt_amount', return_value="TOKEN_NO_ACCESS"):
+        result = process_row(0, '123', "test_token", mock_logger)
         assert result.debt_amount == "TOKEN_NO_ACCESS"
         mock_logger.error.assert_called()
 
@@ -80,6 +100,33 @@ def test_process_row_api_error(mock_logger):
 
 
 
+def test_drop_duplicate_numbers(mock_logger):
+    df = pd.DataFrame({
+        'number': ['123', '456', '123', '456', '789'],
+        'Debt Amount': [None, 100.0, None, None, None]
+    })
+    result = drop_duplicate_numbers(df, mock_logger)
+    assert list(result.index) == [0, 1, 3, 4]
+
+
+def test_signal_handler_only_sets_stop_event():
+    import signal
+
+    previous = signal.getsignal(signal.SIGINT)
+    try:
+        setup_signal_handler()
+
+        with patch("debt_checker.utils.save_temp_data") as mock_save:
+            signal.getsignal(signal.SIGINT)(signal.SIGINT, None)
+
+        # Writing is left to the writer thread and main's final save
+        mock_save.assert_not_called()
+        assert stop_event.is_set()
+    finally:
+        signal.signal(signal.SIGINT, previous)
+        stop_event.clear()
+
+
 def test_save_temp_data(temp_dir, mock_logger):
     os.makedirs(temp_dir, exist_ok=True)
     test_data = [ProcessResult(0, '123', 100.0)]
@@ -88,10 +135,25 @@ def test_save_temp_data(temp_dir, mock_logger):
 
     files = os.listdir(temp_dir)
     assert len(files) == 1
-    assert "temp_1.csv" in files[0]
+    assert files[0] == "numbers_with_debt_temp.csv"
     mock_logger.info.assert_called()
 
 
+def test_save_temp_data_appends_to_single_file(temp_dir, mock_logger):
+    os.makedirs(temp_dir, exist_ok=True)
+
+    save_temp_data([ProcessResult(0, '123', 100.0)], 1, mock_logger, temp_dir)
+    save_temp_data([ProcessResult(1, '456', None, 'NETWORK_ERROR')], 2,
+                   mock_logger, temp_dir)
+
+    assert os.listdir(temp_dir) == ["numbers_with_debt_temp.csv"]
+    saved = pd.read_csv(temp_dir / "numbers_with_debt_temp.csv", dtype={'number': str})
+    assert list(saved['number']) == ['123', '456']
+    assert list(saved.columns) == [
+        'index', 'number', 'debt_amount', 'error', 'fetched_at'
+    ]
+
+
 def test_merge_temp_files(sample_dataframe, temp_dir, mock_logger):
     os.makedirs(temp_dir, exist_ok=True)
 
@@ -106,6 +168,158 @@ def test_merge_temp_files(sample_dataframe, temp_dir, mock_logger):
     assert len(result) == 3
 
 
+def test_merge_temp_files_ignores_token_errors(temp_dir, tmp_path, mock_logger):
+    os.makedirs(temp_dir, exist_ok=True)
+    pd.DataFrame({
+        'number': ['123', '456'],
+        'debt_amount': [100.0, 'TOKEN_NO_MONEY'],
+    }).to_csv(temp_dir / "numbers_with_debt_temp.csv", index=False)
+    original = pd.DataFrame({
+        'number': ['123', '456'],
+        'Debt Amount': pd.array([pd.NA, pd.NA], dtype='Float64'),
+    })
+
+    result = merge_temp_files(
+        temp_dir, original, str(tmp_path / "out.xlsx"), mock_logger
+    )
+
+    assert result['Debt Amount'].dtype == 'Float64'
+    assert result['Debt Amount'][0] == 100.0
+    assert pd.isna(result['Debt Amount'][1])
+
+
+def test_merge_temp_files_keeps_latest_lookup(temp_dir, tmp_path, mock_logger):
+    os.makedirs(temp_dir, exist_ok=True)
+    pd.DataFrame({
+        'number': ['123', '123', '123'],
+        'debt_amount': [0.0, 500.0, None],
+    }).to_csv(temp_dir / "numbers_with_debt_temp.csv", index=False)
+    original = pd.DataFrame({'number': ['123'], 'Debt Amount': [None]})
+
+    result = merge_temp_files(
+        temp_dir, original, str(tmp_path / "out.xlsx"), mock_logger
+    )
+
+    assert result['Debt Amount'][0] == 500.0
+
+
+def test_merge_temp_files_current_checkpoint_wins(temp_dir, tmp_path, mock_logger):
+    os.makedirs(temp_dir, exist_ok=True)
+    pd.DataFrame({'number': ['123'], 'debt_amount': [0.0]}).to_csv(
+        temp_dir / "numbers_with_debt_temp_10.csv", index=False
+    )
+    pd.DataFrame({'number': ['123'], 'debt_amount': [500.0]}).to_csv(
+        temp_dir / "numbers_with_debt_temp.csv", index=False
+    )
+    original = pd.DataFrame({'number': ['123'], 'Debt Amount': [None]})
+
+    result = merge_temp_files(
+        temp_dir, original, str(tmp_path / "out.xlsx"), mock_logger
+    )
+
+    assert result['Debt Amount'][0] == 500.0
+
+
+def test_prime_cache_from_temp_files(temp_dir, tmp_path, mock_logger):
+    os.makedirs(temp_dir, exist_ok=True)
+    now = time.time()
+    pd.DataFrame({
+        "number": ["123", "456", "789", "999"],
+        "debt_amount": [100.0, None, "TOKEN_NO_MONEY", 50.0],
+        "fetched_at": [now, now, now, now - 30 * 86400],
+    }).to_csv(temp_dir / "numbers_with_debt_temp.csv", index=False)
+    cache = DebtCache(str(tmp_path / "cache.db"))
+
+    assert prime_cache_from_temp_files(cache, temp_dir, mock_logger) == 1
+    assert cache.get("123") == 100.0
+    assert cache.get("456") is None
+    assert cache.get("789") is None
+    # Older than the TTL: priming must not bring it back
+    assert cache.get("999") is None
+
+
+def test_prime_cache_does_not_extend_cached_entries(temp_dir, tmp_path, mock_logger):
+    os.makedirs(temp_dir, exist_ok=True)
+    cache = DebtCache(str(tmp_path / "cache.db"), ttl=-1)
+    cache.set("123", 100.0)  # Already expired
+    cache.ttl = DEFAULT_TTL
+    pd.DataFrame({
+        "number": ["123"], "debt_amount": [100.0], "fetched_at": [time.time()],
+    }).to_csv(temp_dir / "numbers_with_debt_temp.csv", index=False)
+
+    assert prime_cache_from_temp_files(cache, temp_dir, mock_logger) == 0
+    assert cache.get("123") is None
+
+
+def test_prime_cache_skips_zero_debts_older_than_negative_ttl(
+    temp_dir, tmp_path, mock_logger
+):
+    os.makedirs(temp_dir, exist_ok=True)
+    two_days_ago = time.time() - 2 * 86400
+    pd.DataFrame({
+        "number": ["123", "456"],
+        "debt_amount": [0.0, 100.0],
+        "fetched_at": [two_days_ago, two_days_ago],
+    }).to_csv(temp_dir / "numbers_with_debt_temp.csv", index=False)
+    cache = DebtCache(str(tmp_path / "cache.db"))
+
+    assert prime_cache_from_temp_files(cache, temp_dir, mock_logger) == 1
+    # Zero debts are re-checked after NEGATIVE_TTL, found debts are kept
+    assert cache.get("123") is None
+    assert cache.get("456") == 100.0
+
+
+def test_save_temp_data_retires_old_format_checkpoint(temp_dir, mock_logger):
+    os.makedirs(temp_dir, exist_ok=True)
+    pd.DataFrame({
+        "index": [0], "number": ["123"], "debt_amount": [1.0], "error": [None],
+    }).to_csv(temp_dir / "numbers_with_debt_temp.csv", index=False)
+
+    save_temp_data([ProcessResult(1, "456", 2.0)], 1, mock_logger, temp_dir)
+
+    assert [os.path.basename(f) for f in list_temp_files(temp_dir)] == [
+        "numbers_with_debt_temp-old.csv", "numbers_with_debt_temp.csv"
+    ]
+    current = pd.read_csv(temp_dir / "numbers_with_debt_temp.csv")
+    assert list(current["number"]) == [456]
+    assert "fetched_at" in current.columns
+
+
+def test_save_temp_data_drops_torn_last_row(temp_dir, mock_logger):
+    os.makedirs(temp_dir, exist_ok=True)
+    save_temp_data([ProcessResult(0, '123', 100.0)], 1, mock_logger, temp_dir)
+    with open(temp_dir / "numbers_with_debt_temp.csv", "a") as f:
+        f.write("1,456,45")  # Crash in the middle of a row
+
+    save_temp_data([ProcessResult(2, '789', 7.0)], 2, mock_logger, temp_dir)
+
+    saved = pd.read_csv(temp_dir / "numbers_with_debt_temp.csv", dtype={'number': str})
+    assert list(saved['number']) == ['123', '789']
+    assert list(saved['debt_amount']) == [100.0, 7.0]
+
+
+def test_merge_temp_files_skips_torn_rows(temp_dir, tmp_path, mock_logger):
+    os.makedirs(temp_dir, exist_ok=True)
+    (temp_dir / "numbers_with_debt_temp.csv").write_text(
+        "index,number,debt_amount,error,fetched_at\n"
+        "0,123,100.0,,1700000000.0\n"
+        "1,456,45,2,789,7.0,,1700000001.0\n"  # Torn row with a batch appended
+        "3,999,12"  # Torn last row
+    )
+    original = pd.DataFrame({
+        'number': ['123', '456', '999'],
+        'Debt Amount': [None, None, None],
+    })
+
+    result = merge_temp_files(
+        temp_dir, original, str(tmp_path / "out.xlsx"), mock_logger
+    )
+
+    assert result['Debt Amount'][0] == 100.0
+    assert pd.isna(result['Debt Amount'][1])
+    assert pd.isna(result['Debt Amount'][2])
+
+
 def test_save_dataframe_to_excel(tmp_path, mock_logger):
     test_file = tmp_path / "output.xlsx"
     df = pd.DataFrame({'number': ['123']})
@@ -113,12 +327,62 @@ def test_save_dataframe_to_excel(tmp_path, mock_logger):
     save_dataframe_to_excel(df, test_file, logger=mock_logger)
 
     assert os.path.exists(test_file)
+    assert list(pd.read_excel(test_file)['number']) == [123]
     mock_logger.info.assert_called()
 
 
-def test_save_dataframe_to_excel_error(mock_logger):
+def test_save_dataframe_to_excel_keeps_every_cell(tmp_path):
+    test_file = tmp_path / "output.xlsx"
+    df = pd.DataFrame({
+        'number': ['0123', '456', '789'],
+        'Debt Amount': [10.5, 0.0, 30.25],
+    })
+
+    save_dataframe_to_excel(df, test_file)
+
+    result = pd.read_excel(test_file, dtype={'number': str})
+    pd.testing.assert_frame_equal(result, df)
+
+
+def test_save_dataframe_to_excel_error(tmp_path, mock_logger):
+    test_file = tmp_path / "test.xlsx"
+    save_dataframe_to_excel(pd.DataFrame({'number': ['123']}), test_file)
+
     with patch('pandas.DataFrame.to_excel', side_effect=Exception("Test error")):
         with pytest.raises(Exception):
-            save_dataframe_to_excel(pd.DataFrame(), "test.xlsx", logger=mock_logger)
+            save_dataframe_to_excel(pd.DataFrame(), test_file, logger=mock_logger)
         mock_logger.exception.assert_called()
 
+    # The previous file survives a failed write and no partial file is left
+    assert list(pd.read_excel(test_file)['number']) == [123]
+    assert os.listdir(tmp_path) == ["test.xlsx"]
+
+
+
+def test_merge_temp_files_keeps_input_untouched(temp_dir, tmp_path, mock_logger):
+    os.makedirs(temp_dir, exist_ok=True)
+    pd.DataFrame({'number': ['0123'], 'debt_amount': [5.0]}).to_csv(
+        temp_dir / "numbers_with_debt_temp.csv", index=False
+    )
+    original = pd.DataFrame({'number': ['0123', '456'], 'Debt Amount': [None, 1.0]})
+
+    result = merge_temp_files(temp_dir, original, tmp_path / "out.xlsx", mock_logger)
+
+    assert list(result['Debt Amount']) == [5.0, 1.0]
+    assert original['Debt Amount'].isna().iloc[0]
+
+
+def test_list_temp_files_filters_checkpoints(temp_dir):
+    os.makedirs(temp_dir, exist_ok=True)
+    for name in ["numbers_with_debt_temp.csv", "numbers_with_debt_temp_10.csv",
+                 "numbers_with_debt_temp_2.csv", "numbers_with_debt_temp-old.csv",
+                 "other.csv", "numbers_with_debt_temp.txt"]:
+        (temp_dir / name).write_text("")
+
+    names = [os.path.basename(p) for p in list_temp_files(temp_dir)]
+    assert names == [
+        "numbers_with_debt_temp_2.csv",
+        "numbers_with_debt_temp_10.csv",
+        "numbers_with_debt_temp-old.csv",
+        "numbers_with_debt_temp.csv",
+    ]